@@ -11,36 +11,124 @@ A comprehensive AI-powered personal assistant with advanced capabilities:
 
 Prerequisites:
 - Install required dependencies using:
-  pip install SpeechRecognition gtts pygame transformers huggingface_hub
+  pip install SpeechRecognition gtts pygame transformers huggingface_hub accelerate bitsandbytes
 """
 
 import os
-import tempfile
+import io
+import hashlib
+import re
+import asyncio
+import threading
 import time
 import sys
+import atexit
 import logging
+import logging.handlers
 import json
 import queue
 import datetime
 import webbrowser
 import random
+from collections import deque
+import numpy as np
 import pygame
+import torch
 import speech_recognition as sr
 from gtts import gTTS
-from transformers import AutoModelForCausalLM, AutoTokenizer, pipeline
-from typing import Dict, List, Any, Optional, Tuple
+from transformers import (
+    AutoConfig, AutoModelForCausalLM, AutoTokenizer, BitsAndBytesConfig, StaticCache, TextIteratorStreamer,
+    pipeline
+)
+from typing import Dict, Final, List, Any, Iterable, Iterator, Optional, Tuple
 from dataclasses import dataclass, field
 
-# Configure comprehensive logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s: %(message)s',
-    handlers=[
-        logging.FileHandler('jarvis_system.log'),
-        logging.StreamHandler()
-    ]
+try:
+    import intel_extension_for_pytorch as ipex  # Optional: BF16/AMX kernels on Intel CPUs
+except ImportError:
+    ipex = None
+
+try:
+    from optimum.onnxruntime import ORTModelForCausalLM  # Optional: ONNX Runtime backend
+except ImportError:
+    ORTModelForCausalLM = None
+
+try:
+    from pywhispercpp.model import Model as WhisperModel  # Optional: local whisper.cpp speech recognition
+except ImportError:
+    WhisperModel = None
+
+try:
+    import orjson  # Optional: C-accelerated JSON for memory persistence
+except ImportError:
+    orjson = None
+
+# Pre-quantized checkpoint formats that need a loader other than transformers' from_pretrained;
+# every other quant_method is handed to transformers, which dispatches to its own kernels
+UNSUPPORTED_QUANT_FORMATS = ("gguf", "exl2")
+
+# Separates consecutive turns in the token history carried between commands
+TURN_DELIMITER = "\n\n"
+
+# Sentence boundaries used to hand streamed text to TTS one sentence at a time
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
+
+# Each new turn is padded up to one of these so CUDA graphs are captured for a fixed set of shapes
+PROMPT_BUCKETS = (16, 32, 64, 128, 256)
+
+# Fixed phrases spoken on every session; their audio is synthesized once and cached
+PRECACHED_PROMPTS = (
+    "JARVIS system online. How may I help you?",
+    "Yes, sir?",
+    "System shutting down. Goodbye!",
+    "I encountered an unexpected error.",
+    "I encountered an error while generating a response.",
 )
 
+# The pygame mixer is shared by speech and music playback; guard its calls with one lock.
+# Speech plays on a reserved channel so it never competes with the music stream.
+MIXER_LOCK = threading.Lock()
+TTS_CHANNEL = 0
+
+# Spoken site names resolved by open_website (keys are casefolded)
+_KNOWN_SITES: Final[Dict[str, str]] = {
+    'youtube': 'https://www.youtube.com',
+    'google': 'https://www.google.com',
+    'stackoverflow': 'https://stackoverflow.com'
+}
+
+# Audio file extensions recognised by play_music (compared lower-cased)
+MUSIC_EXTENSIONS = frozenset({'.mp3', '.wav', '.flac'})
+
+def _json_dumps(obj: Any, indent: bool = False) -> bytes:
+    """Serialize to UTF-8 JSON bytes, preferring orjson when available"""
+    if orjson is not None:
+        # OPT_NON_STR_KEYS matches stdlib json, which stringifies int/float/bool/None keys
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(obj, option=option)
+    return json.dumps(obj, indent=2 if indent else None).encode("utf-8")
+
+def _json_loads(data: bytes) -> Any:
+    """Parse UTF-8 JSON bytes, preferring orjson when available"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+# Configure comprehensive logging.
+# Records are handed to a background listener thread so file and console I/O
+# never block the voice loop.
+_log_formatter = logging.Formatter('%(asctime)s - %(levelname)s: %(message)s')
+_log_handlers = [logging.FileHandler('jarvis_system.log'), logging.StreamHandler()]
+for _handler in _log_handlers:
+    _handler.setFormatter(_log_formatter)
+_log_queue: queue.Queue = queue.Queue(-1)
+_log_listener = logging.handlers.QueueListener(_log_queue, *_log_handlers)
+_log_listener.start()
+atexit.register(_log_listener.stop)
+_queue_handler = logging.handlers.QueueHandler(_log_queue)
+_queue_handler.setFormatter(logging.Formatter('%(message)s'))  # Full layout is applied by the listener's handlers
+logging.basicConfig(level=logging.INFO, handlers=[_queue_handler])
+
 @dataclass
 class SystemConfig:
     """
@@ -55,28 +143,99 @@ class SystemConfig:
     music_directory: str = "music"  # Default music directory
     huggingface_api_key: str = "enter-your-api-key"  # Your Hugging Face API key
     model_name: str = "deepseek-ai/DeepSeek-V3"  # DeepSeek-V3 model
+    model_revision: Optional[str] = None  # Branch, tag or commit of model_name
+    quantization: Optional[str] = "int8"  # One of "int8", "nf4", "bf16", "fp16", or None for the checkpoint as-is
+    quant_format: Optional[str] = None  # Pre-quantized checkpoint format; detected from config.json when None
+    max_new_tokens: int = 150  # Upper bound on generated tokens per response
+    max_context_tokens: int = 2048  # Conversation history is reset before a turn would grow past this
+    compile: str = "none"  # One of "none", "torch", "onnxrt"
+    batch_size: int = 8  # Max prompts served by one batched generate() call
+    batch_wait_ms: int = 20  # How long the batcher waits for more prompts to arrive
+    stt_backend: str = "google"  # One of "google" (cloud) or "whisper" (local whisper.cpp)
+    whisper_model: str = "base.en-q8_0"  # whisper.cpp model name or path to a GGML file
+    noise_recalibration_interval: float = 300.0  # Seconds between ambient noise recalibrations
+    noise_recalibration_errors: int = 3  # Consecutive unintelligible utterances that force a recalibration
+    tts_cache_dir: str = os.path.join(os.path.expanduser("~"), ".cache", "jarvis", "tts")  # Persisted phrase audio
 
 class Memory:
     """
     Advanced memory management system with sophisticated 
     short-term and long-term memory capabilities.
+    Long-term entries are appended to a JSONL log and folded into the
+    JSON snapshot every snapshot_every appends and on close().
+    The snapshot and the log header share a generation number, so a log
+    that was already folded in is never replayed twice.
     """
-    def __init__(self, memory_file: str = "jarvis_memory.json"):
+    def __init__(self, memory_file: str = "jarvis_memory.json", snapshot_every: int = 100):
         self.memory_file = memory_file
-        self.short_term = queue.Queue(maxsize=100)
+        self.log_file = memory_file + ".log"
+        self.snapshot_every = snapshot_every
+        self.short_term = deque(maxlen=100)  # Oldest entries are evicted automatically
+        self._pending = 0  # Log entries not yet folded into the snapshot
+        self._generation = 0  # Snapshot generation the current log extends
         self.long_term = self._load_memory()
+        self._jsonl = open(self.log_file, 'ab', buffering=0)
+        if self._jsonl.tell() == 0:
+            self._write_log_header()
 
     def _load_memory(self) -> Dict:
-        """Load persistent memory from storage"""
+        """Load persistent memory from storage, replaying any unsnapshotted log entries"""
         try:
-            with open(self.memory_file, 'r') as f:
-                return json.load(f)
+            with open(self.memory_file, 'rb') as f:
+                memory = _json_loads(f.read())
         except FileNotFoundError:
-            return {
+            memory = {
                 "conversations": [],
                 "learned_preferences": {},
                 "system_interactions": []
             }
+        self._generation = memory.pop("_log_generation", 0)
+        self._replay_log(memory)
+        return memory
+
+    def _replay_log(self, memory: Dict) -> None:
+        """
+        Append logged entries to memory. A log from an older generation was
+        folded into the snapshot before a crash and is discarded; a torn
+        tail is cut off so the next append starts on a clean line.
+        """
+        try:
+            with open(self.log_file, 'rb') as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return
+
+        good_offset = 0
+        for index, line in enumerate(lines):
+            try:
+                if not line.endswith(b"\n"):
+                    raise json.JSONDecodeError("unterminated line", "", 0)
+                record = _json_loads(line)
+            except ValueError:
+                # A torn final line from an interrupted write. ValueError covers both
+                # JSONDecodeError and the UnicodeDecodeError stdlib json raises on a split UTF-8 sequence.
+                logging.warning("Discarding corrupt memory log tail in %s", self.log_file)
+                break
+
+            if index == 0 and "log_generation" in record:
+                if record["log_generation"] < self._generation:
+                    logging.info("Memory log %s was already folded into the snapshot", self.log_file)
+                    break
+            else:
+                memory["conversations"].append(record)
+                self._pending += 1
+            good_offset += len(line)
+
+        if good_offset < sum(len(line) for line in lines):
+            with open(self.log_file, 'r+b') as f:
+                f.truncate(good_offset)
+
+    def _write_log_header(self) -> None:
+        """Record which snapshot generation the log entries that follow extend"""
+        try:
+            self._jsonl.write(_json_dumps({"log_generation": self._generation}) + b"\n")
+        except IOError as e:
+            logging.error("Memory log write error: %s", e)
 
     def add_memory(self, memory_type: str, content: Any) -> None:
         """
@@ -86,24 +245,50 @@ class Memory:
         timestamp = datetime.datetime.now().isoformat()
         
         if memory_type == "short_term":
-            if self.short_term.full():
-                self.short_term.get()
-            self.short_term.put({"timestamp": timestamp, "content": content})
+            self.short_term.append({"timestamp": timestamp, "content": content})
         
         elif memory_type == "long_term":
-            self.long_term["conversations"].append({
-                "timestamp": timestamp,
-                "content": content
-            })
-            self._save_memory()
-
-    def _save_memory(self) -> None:
-        """Persist long-term memories to disk"""
+            entry = {"timestamp": timestamp, "content": content}
+            try:
+                line = _json_dumps(entry) + b"\n"
+            except TypeError as e:
+                # Keep unserializable content out of long_term so later snapshots still succeed
+                logging.error("Memory serialization error: %s", e)
+                return
+            self.long_term["conversations"].append(entry)
+            try:
+                self._jsonl.write(line)
+            except IOError as e:
+                logging.error("Memory log write error: %s", e)
+            self._pending += 1
+            if self._pending >= self.snapshot_every:
+                self.flush_snapshot()
+
+    def flush_snapshot(self) -> None:
+        """Fold the append-only log into the JSON snapshot and start a new log generation"""
+        if self._pending and self._save_memory(self._generation + 1):
+            self._generation += 1
+            self._jsonl.truncate(0)
+            self._write_log_header()
+            self._pending = 0
+
+    def close(self) -> None:
+        """Write a final snapshot and release the log file"""
+        self.flush_snapshot()
+        self._jsonl.close()
+
+    def _save_memory(self, generation: int) -> bool:
+        """Persist long-term memories to disk, returning whether the snapshot was written"""
+        temp_file = self.memory_file + ".tmp"
         try:
-            with open(self.memory_file, 'w') as f:
-                json.dump(self.long_term, f, indent=4)
-        except IOError as e:
-            logging.error(f"Memory save error: {e}")
+            with open(temp_file, 'wb') as f:
+                f.write(_json_dumps({**self.long_term, "_log_generation": generation}, indent=True))
+            # Replace atomically so a crash never leaves a half-written snapshot
+            os.replace(temp_file, self.memory_file)
+            return True
+        except (IOError, TypeError) as e:
+            logging.error("Memory save error: %s", e)
+            return False
 
 class PracticalFeatures:
     """
@@ -113,20 +298,16 @@ class PracticalFeatures:
     def __init__(self, config: SystemConfig):
         self.config = config
         self.music_queue = queue.Queue()
+        self._music_cache: Optional[Tuple[float, List[str]]] = None  # (directory mtime, track names)
 
     def open_website(self, site: str) -> Tuple[bool, str]:
         """Open specified website with error handling"""
         try:
-            known_sites = {
-                'youtube': 'https://www.youtube.com',
-                'google': 'https://www.google.com',
-                'stackoverflow': 'https://stackoverflow.com'
-            }
-            url = known_sites.get(site.lower(), site)
+            url = _KNOWN_SITES.get(site.casefold(), site)
             webbrowser.open(url)
             return True, f"Opening {url}"
         except Exception as e:
-            logging.error(f"Website opening error: {e}")
+            logging.error("Website opening error: %s", e)
             return False, f"Could not open {site}"
 
     def play_music(self, track_name: Optional[str] = None) -> Tuple[bool, str]:
@@ -136,14 +317,10 @@ class PracticalFeatures:
         """
         try:
             music_dir = self.config.music_directory
-            if not os.path.exists(music_dir):
+            music_files = self._list_music(music_dir)
+            if music_files is None:
                 return False, "Music directory not found"
 
-            music_files = [
-                f for f in os.listdir(music_dir) 
-                if f.lower().endswith(('.mp3', '.wav', '.flac'))
-            ]
-
             if not music_files:
                 return False, "No music files found"
 
@@ -156,16 +333,36 @@ class PracticalFeatures:
                 return False, f"Track {track_name} not found"
 
             full_path = os.path.join(music_dir, selected_track)
-            pygame.mixer.init()
-            pygame.mixer.music.load(full_path)
-            pygame.mixer.music.play()
+            with MIXER_LOCK:
+                pygame.mixer.music.load(full_path)
+                pygame.mixer.music.play()
 
             return True, f"Now playing: {selected_track}"
 
         except Exception as e:
-            logging.error(f"Music playback error: {e}")
+            logging.error("Music playback error: %s", e)
             return False, "Music playback failed"
 
+    def _list_music(self, music_dir: str) -> Optional[List[str]]:
+        """
+        Return the track names in music_dir, rescanning only when the
+        directory's mtime changes. Returns None if the directory is missing.
+        """
+        try:
+            mtime = os.stat(music_dir).st_mtime
+        except FileNotFoundError:
+            self._music_cache = None
+            return None
+
+        if self._music_cache is None or self._music_cache[0] != mtime:
+            with os.scandir(music_dir) as entries:
+                tracks = [
+                    entry.name for entry in entries
+                    if entry.is_file() and os.path.splitext(entry.name)[1].lower() in MUSIC_EXTENSIONS
+                ]
+            self._music_cache = (mtime, tracks)
+        return self._music_cache[1]
+
 class AudioSystem:
     """
     Advanced audio input/output management with 
@@ -175,49 +372,198 @@ class AudioSystem:
         self.config = config
         self.recognizer = sr.Recognizer()
         self.microphone = sr.Microphone()
-        pygame.mixer.init()
+        self._whisper = self._load_stt_backend()
+        self._clock = pygame.time.Clock()
+        self._tts_cache: Dict[Tuple[str, str], bytes] = {}
+        self._preload_prompts()
+
+        # Calibrate once up front; listen() only recalibrates when the threshold looks stale
+        self._source: Optional[sr.AudioSource] = None
+        self._unintelligible = 0
+        self._calibrated_at = 0.0
+        with self.microphone as source:
+            self._calibrate(source)
+
+    def __enter__(self) -> "AudioSystem":
+        """Keep the microphone stream open across listen() calls"""
+        self._source = self.microphone.__enter__()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._source = None
+        self.microphone.__exit__(*exc_info)
 
     def listen(self, timeout: int = 5, phrase_time_limit: int = 3) -> Tuple[bool, str]:
         """
         Robust speech recognition with enhanced noise handling and timeout management
         """
+        if self._source is not None:
+            return self._listen(self._source, timeout, phrase_time_limit)
         with self.microphone as source:
-            try:
-                self.recognizer.adjust_for_ambient_noise(source, duration=1.5)
-                audio = self.recognizer.listen(source, timeout=timeout, phrase_time_limit=phrase_time_limit)
-                text = self.recognizer.recognize_google(audio).lower()
-                return True, text
-            except sr.UnknownValueError:
-                logging.warning("Speech was unintelligible")
-                return False, ""
-            except sr.RequestError as e:
-                logging.error(f"Could not request results from Google Speech Recognition service: {e}")
-                return False, ""
-            except Exception as e:
-                logging.error(f"Listening error: {e}")
-                return False, ""
+            return self._listen(source, timeout, phrase_time_limit)
 
-    def speak(self, text: str) -> None:
-        """Enhanced text-to-speech conversion with robust error handling"""
+    def _listen(self, source: sr.AudioSource, timeout: int, phrase_time_limit: int) -> Tuple[bool, str]:
+        """Capture and transcribe one utterance from an open audio source"""
         try:
-            with tempfile.NamedTemporaryFile(suffix=".mp3", delete=False) as temp_file:
-                filename = temp_file.name
-                tts = gTTS(text=text, lang=self.config.language)
-                tts.save(filename)
+            if self._needs_recalibration():
+                self._calibrate(source)
+            audio = self.recognizer.listen(source, timeout=timeout, phrase_time_limit=phrase_time_limit)
+            text = self._transcribe(audio).lower()
+            self._unintelligible = 0
+            return True, text
+        except sr.UnknownValueError:
+            logging.warning("Speech was unintelligible")
+            self._unintelligible += 1
+            return False, ""
+        except sr.RequestError as e:
+            logging.error("Could not request results from Google Speech Recognition service: %s", e)
+            return False, ""
+        except Exception as e:
+            logging.error("Listening error: %s", e)
+            return False, ""
 
-                pygame.mixer.music.load(filename)
-                pygame.mixer.music.play()
+    def _load_stt_backend(self):
+        """Load the local recognizer if one is configured; the Google backend needs no setup"""
+        backend = self.config.stt_backend
+        if backend == "google":
+            return None
+        if backend == "whisper":
+            if WhisperModel is None:
+                raise RuntimeError("stt_backend='whisper' requires pywhispercpp to be installed")
+            return WhisperModel(self.config.whisper_model)
+        raise ValueError(f"Unsupported speech recognition backend: {backend}")
+
+    def _transcribe(self, audio: sr.AudioData) -> str:
+        """Convert captured audio to text with the configured backend"""
+        if self._whisper is None:
+            return self.recognizer.recognize_google(audio)
+
+        # whisper.cpp expects 16 kHz mono float32 samples in [-1, 1]
+        raw = audio.get_raw_data(convert_rate=16000, convert_width=2)
+        samples = np.frombuffer(raw, dtype=np.int16).astype(np.float32) / 32768.0
+        text = " ".join(segment.text.strip() for segment in self._whisper.transcribe(samples)).strip()
+        if not text:
+            raise sr.UnknownValueError()
+        return text
+
+    def _calibrate(self, source: sr.AudioSource) -> None:
+        """Measure ambient noise and reset the recognizer's energy threshold"""
+        self.recognizer.adjust_for_ambient_noise(source, duration=1.5)
+        self._calibrated_at = time.monotonic()
+        self._unintelligible = 0
+        logging.info("Calibrated energy threshold: %.1f", self.recognizer.energy_threshold)
+
+    def _needs_recalibration(self) -> bool:
+        """Recalibrate periodically, or sooner if recognition keeps failing"""
+        return (
+            time.monotonic() - self._calibrated_at > self.config.noise_recalibration_interval
+            or self._unintelligible >= self.config.noise_recalibration_errors
+        )
 
-                start_time = time.time()
-                while pygame.mixer.music.get_busy():
-                    pygame.time.Clock().tick(10)
-                    if time.time() - start_time > 10:  # 10-second timeout
-                        pygame.mixer.music.stop()
-                        break
+    def speak(self, text: str) -> None:
+        """Enhanced text-to-speech conversion with robust error handling"""
+        try:
+            self._play(self._synthesize(text))
         except Exception as e:
-            logging.error(f"Speech synthesis error: {e}")
+            logging.error("Speech synthesis error: %s", e)
             print(f"Speech synthesis failed: {e}")
 
+    def speak_queue(self, sentences: queue.Queue) -> None:
+        """
+        Speak sentences as they are produced, until a None sentinel arrives.
+        Intended to run on a worker thread alongside response generation.
+        Synthesis runs here while a separate thread plays finished audio, so
+        the next sentence's gTTS round trip overlaps the current playback.
+        """
+        buffers: queue.Queue = queue.Queue()
+        player = threading.Thread(target=self._play_queue, args=(buffers,), daemon=True)
+        player.start()
+        try:
+            while True:
+                text = sentences.get()
+                if text is None:
+                    break
+                try:
+                    buffers.put(self._synthesize(text))
+                except Exception as e:
+                    logging.error("Speech synthesis error: %s", e)
+                    print(f"Speech synthesis failed: {e}")
+        finally:
+            buffers.put(None)
+            player.join()
+
+    def _play_queue(self, buffers: queue.Queue) -> None:
+        """Play synthesized audio buffers in order until a None sentinel arrives"""
+        while True:
+            buffer = buffers.get()
+            if buffer is None:
+                break
+            try:
+                self._play(buffer)
+            except Exception as e:
+                logging.error("Speech playback error: %s", e)
+
+    def _synthesize(self, text: str) -> io.BytesIO:
+        """
+        Render text to an in-memory MP3 buffer.
+        Fixed phrases are served from the cache instead of a gTTS round trip.
+        """
+        key = (text, self.config.language)
+        audio = self._tts_cache.get(key)
+        if audio is None:
+            buffer = io.BytesIO()
+            gTTS(text=text, lang=self.config.language).write_to_fp(buffer)
+            audio = buffer.getvalue()
+            if text in PRECACHED_PROMPTS:
+                self._tts_cache[key] = audio
+        return io.BytesIO(audio)
+
+    def _preload_prompts(self) -> None:
+        """Fill the phrase cache from disk, synthesizing and persisting any missing entries"""
+        try:
+            os.makedirs(self.config.tts_cache_dir, exist_ok=True)
+        except OSError as e:
+            logging.warning("TTS cache directory unavailable: %s", e)
+
+        for text in PRECACHED_PROMPTS:
+            digest = hashlib.sha1(f"{self.config.language}:{text}".encode("utf-8")).hexdigest()
+            path = os.path.join(self.config.tts_cache_dir, f"{digest}.mp3")
+            try:
+                with open(path, 'rb') as f:
+                    audio = f.read()
+                if audio:
+                    self._tts_cache[(text, self.config.language)] = audio
+                    continue
+            except IOError:
+                pass
+
+            try:
+                audio = self._synthesize(text).getvalue()
+            except Exception as e:
+                logging.warning("Could not precache speech for '%s': %s", text, e)
+                continue
+            try:
+                # Write beside the target and rename, so an interrupted write never leaves
+                # a truncated file that later startups would treat as a cache hit
+                with open(path + ".tmp", 'wb') as f:
+                    f.write(audio)
+                os.replace(path + ".tmp", path)
+            except IOError as e:
+                logging.warning("TTS cache write error: %s", e)
+
+    def _play(self, buffer: io.BytesIO) -> None:
+        """Play an in-memory audio buffer and block until it finishes"""
+        sound = pygame.mixer.Sound(file=buffer)
+        with MIXER_LOCK:
+            channel = pygame.mixer.Channel(TTS_CHANNEL)
+            channel.play(sound)
+        start_time = time.time()
+        while channel.get_busy():
+            self._clock.tick(10)
+            if time.time() - start_time > 10:  # 10-second timeout
+                channel.stop()
+                break
+
 class NLPEngine:
     """
     Natural Language Processing core with intent classification,
@@ -227,21 +573,405 @@ class NLPEngine:
         self.config = config
         try:
             # Load tokenizer and model with trust_remote_code=True
-            self.tokenizer = AutoTokenizer.from_pretrained(config.model_name, trust_remote_code=True)
-            self.model = AutoModelForCausalLM.from_pretrained(config.model_name, trust_remote_code=True)
+            self.tokenizer = AutoTokenizer.from_pretrained(
+                config.model_name,
+                revision=config.model_revision,
+                trust_remote_code=True
+            )
+            # Decoder-only models must be left-padded so every batch row generates from its
+            # last real token; bucketed turns are left-padded too, so make sure a pad token exists
+            self.tokenizer.padding_side = "left"
+            if self.tokenizer.pad_token is None:
+                self.tokenizer.pad_token = self.tokenizer.eos_token
+            if config.compile == "onnxrt":
+                self.model = self._load_ort_model()
+                self.device = self.model.device
+                self._static_cache = None
+            elif config.compile in ("none", "torch"):
+                self.model = self._load_model()
+                self.model.eval()
+                # With device_map="auto" the model may span devices; inputs go where the embeddings live
+                self.device = self.model.get_input_embeddings().weight.device
+                self._static_cache = None
+                if config.compile == "torch":
+                    self._compile_model()
+            else:
+                raise ValueError(f"Unsupported compile backend: {config.compile}")
         except Exception as e:
-            logging.critical(f"Failed to load NLP model: {e}")
+            logging.critical("Failed to load NLP model: %s", e)
             raise RuntimeError(f"NLP model initialization failed: {e}")
 
+        # Conversation state carried across turns so earlier tokens are not re-encoded
+        self.past_key_values = self._static_cache
+        self.last_input_ids = None
+        self.last_attention_mask = None
+        # Serializes generate() calls and the conversation state they read and update
+        self._model_lock = threading.Lock()
+
+    def _load_model(self):
+        """
+        Load the causal LM, either as a pre-quantized checkpoint or with
+        on-the-fly quantization according to the configured mode.
+        """
+        quant_format = self._detect_quant_format()
+        if quant_format:
+            # The checkpoint carries its own quantization_config; transformers
+            # dispatches to the matching AWQ/GPTQ/FP8 kernels on its own.
+            logging.info("Loading pre-quantized %s checkpoint", quant_format)
+            if self.config.quantization is not None:
+                logging.warning(
+                    "Checkpoint is already %s-quantized; ignoring quantization=%r "
+                    "(set SystemConfig.quantization to None to silence this)",
+                    quant_format, self.config.quantization
+                )
+            return AutoModelForCausalLM.from_pretrained(
+                self.config.model_name,
+                revision=self.config.model_revision,
+                torch_dtype="auto",
+                device_map="auto",
+                low_cpu_mem_usage=True,
+                trust_remote_code=True
+            )
+
+        dtype = {"bf16": torch.bfloat16, "fp16": torch.float16}.get(self.config.quantization, None)
+        model = AutoModelForCausalLM.from_pretrained(
+            self.config.model_name,
+            revision=self.config.model_revision,
+            quantization_config=self._build_quant_config(),
+            torch_dtype=dtype,
+            device_map="auto",
+            low_cpu_mem_usage=True,
+            trust_remote_code=True
+        )
+        if not torch.cuda.is_available() and self.config.quantization == "bf16":
+            model = self._optimize_for_cpu(model)
+        return model
+
+    def _compile_model(self) -> None:
+        """
+        Compile the model's forward. Models that support a static KV-cache get
+        CUDA-graph capture ("reduce-overhead") with one static cache sized to the
+        context cap, kept across turns; others fall back to dynamic-shape compilation.
+        """
+        supports_static_cache = (
+            getattr(self.model, "_can_compile_fullgraph", False)
+            or getattr(self.model, "_supports_static_cache", False)
+        )
+        # Compile forward rather than the module: generate() calls self.forward directly
+        if not supports_static_cache:
+            logging.warning(
+                "%s does not support a static KV-cache; compiling with dynamic shapes and "
+                "without CUDA graphs", type(self.model).__name__
+            )
+            self.model.forward = torch.compile(self.model.forward, dynamic=True)
+            return
+
+        # CUDA graphs need fixed shapes, so each new turn is also padded to a PROMPT_BUCKETS length
+        self.model.forward = torch.compile(self.model.forward, mode="reduce-overhead")
+        self._static_cache = StaticCache(config=self.model.config, max_cache_len=self.config.max_context_tokens)
+
+    def _load_ort_model(self):
+        """
+        Export the model to ONNX and run it through ONNX Runtime.
+        The ORT model exposes the same generate() API as the transformers one.
+        """
+        if ORTModelForCausalLM is None:
+            raise RuntimeError("compile='onnxrt' requires optimum[onnxruntime-gpu] to be installed")
+        provider = "CUDAExecutionProvider" if torch.cuda.is_available() else "CPUExecutionProvider"
+        return ORTModelForCausalLM.from_pretrained(
+            self.config.model_name,
+            revision=self.config.model_revision,
+            export=True,
+            provider=provider,
+            use_io_binding=provider == "CUDAExecutionProvider",
+            trust_remote_code=True
+        )
+
+    def _detect_quant_format(self) -> Optional[str]:
+        """
+        Determine whether model_name points at a pre-quantized checkpoint.
+        An explicit quant_format wins; otherwise config.json is inspected.
+        """
+        quant_format = self.config.quant_format
+        if quant_format is None:
+            model_config = AutoConfig.from_pretrained(
+                self.config.model_name,
+                revision=self.config.model_revision,
+                trust_remote_code=True
+            )
+            quant_config = getattr(model_config, "quantization_config", None)
+            if quant_config is None:
+                return None
+            if isinstance(quant_config, dict):
+                quant_format = quant_config.get("quant_method")
+            else:
+                quant_format = getattr(quant_config, "quant_method", None)
+
+        if not quant_format:
+            # A quantization_config without a quant_method does not identify a loadable format
+            return None
+        # quant_method may be a QuantizationMethod enum rather than a plain string
+        quant_format = str(getattr(quant_format, "value", quant_format)).lower()
+        if quant_format in UNSUPPORTED_QUANT_FORMATS:
+            raise ValueError(
+                f"Pre-quantized format '{quant_format}' needs a dedicated loader and cannot be "
+                f"loaded here. Unsupported formats: {', '.join(UNSUPPORTED_QUANT_FORMATS)}"
+            )
+        return quant_format
+
+    def _build_quant_config(self) -> Optional[BitsAndBytesConfig]:
+        """
+        Translate the configured quantization mode into a bitsandbytes config.
+        Returns None for modes that load unquantized weights.
+        """
+        mode = self.config.quantization
+        if mode == "int8":
+            # LLM.int8(): int8 weights with FP16 decomposition for outlier features
+            return BitsAndBytesConfig(load_in_8bit=True, llm_int8_threshold=6.0)
+        if mode == "nf4":
+            # 4-bit NormalFloat weights, dequantized to BF16 per tile for compute.
+            # Embeddings and the LM head are quality-sensitive, so keep them in half precision.
+            return BitsAndBytesConfig(
+                load_in_4bit=True,
+                bnb_4bit_quant_type="nf4",
+                bnb_4bit_compute_dtype=torch.bfloat16,
+                bnb_4bit_use_double_quant=True,
+                llm_int8_skip_modules=["embed_tokens", "lm_head"]
+            )
+        if mode in (None, "bf16", "fp16"):
+            return None
+        raise ValueError(f"Unsupported quantization mode: {mode}")
+
+    def _optimize_for_cpu(self, model):
+        """Apply IPEX BF16 kernel optimizations when running without a GPU"""
+        if ipex is None:
+            logging.warning("intel_extension_for_pytorch not installed; running BF16 model on stock CPU kernels")
+            return model
+        return ipex.optimize(model.eval(), dtype=torch.bfloat16)
+
+    def reset_context(self) -> None:
+        """Drop the cached conversation so the next prompt starts a fresh session"""
+        if self._static_cache is not None:
+            # Cache tensors are allocated lazily inside generate()'s inference_mode, and
+            # in-place updates to inference tensors are only allowed under inference_mode
+            with torch.inference_mode():
+                self._static_cache.reset()
+        self.past_key_values = self._static_cache
+        self.last_input_ids = None
+        self.last_attention_mask = None
+
     def generate_response(self, prompt: str) -> str:
-        """Generate a response using the DeepSeek-V3 model"""
+        """
+        Generate a response using the DeepSeek-V3 model.
+        Only the new turn is encoded; earlier turns are served from the KV-cache.
+        """
+        with self._model_lock:
+            try:
+                input_ids, attention_mask = self._prepare_turn(prompt)
+                sequences = self._generate_turn(input_ids, attention_mask)
+                return self.tokenizer.decode(sequences[0, input_ids.shape[-1]:], skip_special_tokens=True)
+            except Exception as e:
+                logging.error("Response generation error: %s", e)
+                # A failed step may leave the cache half-updated
+                self.reset_context()
+                return "I encountered an error while generating a response."
+
+    def stream_response(self, prompt: str) -> Iterator[str]:
+        """
+        Yield response text incrementally while generation runs on a worker thread.
+        Shares the conversational KV-cache with generate_response.
+        """
+        streamer = TextIteratorStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True)
+        errors: List[Exception] = []
+        worker = threading.Thread(target=self._stream_worker, args=(prompt, streamer, errors), daemon=True)
+        worker.start()
+        produced = False
+        for text in streamer:
+            produced = produced or bool(text)
+            yield text
+        worker.join()
+        if errors and not produced:
+            yield "I encountered an error while generating a response."
+
+    def _stream_worker(self, prompt: str, streamer: TextIteratorStreamer, errors: List[Exception]) -> None:
+        """Run a streamed generation, making sure the consumer is released on failure"""
+        with self._model_lock:
+            try:
+                input_ids, attention_mask = self._prepare_turn(prompt)
+                self._generate_turn(input_ids, attention_mask, streamer=streamer)
+            except Exception as e:
+                logging.error("Response generation error: %s", e)
+                errors.append(e)
+                try:
+                    self.reset_context()
+                except Exception as reset_error:
+                    logging.error("Context reset error: %s", reset_error)
+            finally:
+                # Always release the consumer; a second end() after a clean run is harmless
+                streamer.end()
+
+    def _prepare_turn(self, prompt: str) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        Tokenize a new turn and append it to the conversation history.
+        The history is reset first if the turn and its reply would exceed max_context_tokens.
+        """
+        if self.last_input_ids is not None:
+            new_ids = self.tokenizer(
+                TURN_DELIMITER + prompt,
+                return_tensors="pt",
+                add_special_tokens=False
+            ).input_ids.to(self.device)
+            history_length = self.last_input_ids.shape[-1]
+            room = self.config.max_context_tokens - self.config.max_new_tokens - history_length
+            if new_ids.shape[-1] <= room:
+                new_ids, new_mask = self._pad_turn(new_ids, room)
+                return (
+                    torch.cat([self.last_input_ids, new_ids], dim=-1),
+                    torch.cat([self.last_attention_mask, new_mask], dim=-1)
+                )
+            logging.info("Conversation history reached %d tokens; starting a fresh context", history_length)
+            self.reset_context()
+
+        # A fresh context; over-long prompts are truncated so the reply still fits
+        room = max(1, self.config.max_context_tokens - self.config.max_new_tokens)
+        new_ids = self.tokenizer(
+            prompt,
+            return_tensors="pt",
+            truncation=True,
+            max_length=room
+        ).input_ids.to(self.device)
+        return self._pad_turn(new_ids, room)
+
+    def _pad_turn(self, new_ids: torch.Tensor, room: int) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        Build the attention mask for a turn's tokens. On the static-cache path the
+        turn is left-padded to its bucket (never past room) so prefill shapes repeat.
+        """
+        new_mask = torch.ones_like(new_ids)
+        if self._static_cache is None:
+            return new_ids, new_mask
+        pad_length = min(self._bucket_length(new_ids.shape[-1]), room) - new_ids.shape[-1]
+        return (
+            torch.nn.functional.pad(new_ids, (pad_length, 0), value=self.tokenizer.pad_token_id),
+            torch.nn.functional.pad(new_mask, (pad_length, 0), value=0)
+        )
+
+    def _generate_turn(
+        self,
+        input_ids: torch.Tensor,
+        attention_mask: torch.Tensor,
+        streamer: Optional[TextIteratorStreamer] = None
+    ) -> torch.Tensor:
+        """Greedy-decode one turn, reusing and then updating the KV-cache"""
+        # inference_mode is thread-local, so it is entered here rather than by callers
+        with torch.inference_mode():
+            outputs = self.model.generate(
+                input_ids,
+                attention_mask=attention_mask,
+                past_key_values=self.past_key_values,
+                max_new_tokens=self.config.max_new_tokens,
+                use_cache=True,
+                do_sample=False,
+                pad_token_id=self.tokenizer.eos_token_id,
+                return_dict_in_generate=True,
+                streamer=streamer
+            )
+        sequences = outputs.sequences
+        generated = sequences.shape[-1] - input_ids.shape[-1]
+        self.past_key_values = outputs.past_key_values
+        self.last_input_ids = sequences
+        self.last_attention_mask = torch.nn.functional.pad(attention_mask, (0, generated), value=1)
+        return sequences
+
+    @staticmethod
+    def _bucket_length(length: int) -> int:
+        """Smallest turn bucket that fits length; longer turns are left unpadded"""
+        return next((bucket for bucket in PROMPT_BUCKETS if bucket >= length), length)
+
+    def generate_batch(self, prompts: List[str]) -> List[str]:
+        """
+        Generate independent responses for several prompts in one padded batch.
+        Batched prompts do not share or update the conversational KV-cache, but they
+        take the same model lock as the conversational path.
+        """
         try:
-            inputs = self.tokenizer(prompt, return_tensors="pt")
-            outputs = self.model.generate(**inputs, max_length=150)
-            return self.tokenizer.decode(outputs[0], skip_special_tokens=True)
+            inputs = self.tokenizer(prompts, padding=True, return_tensors="pt")
+            if self.device.type == "cuda":
+                # Stage through pinned memory so the host-to-device copy can run asynchronously
+                inputs = {k: v.pin_memory().to(self.device, non_blocking=True) for k, v in inputs.items()}
+            else:
+                inputs = {k: v.to(self.device) for k, v in inputs.items()}
+
+            with self._model_lock, torch.inference_mode():
+                outputs = self.model.generate(
+                    **inputs,
+                    max_new_tokens=self.config.max_new_tokens,
+                    use_cache=True,
+                    do_sample=False,
+                    pad_token_id=self.tokenizer.pad_token_id
+                )
+            prompt_length = inputs["input_ids"].shape[-1]
+            return self.tokenizer.batch_decode(outputs[:, prompt_length:], skip_special_tokens=True)
         except Exception as e:
-            logging.error(f"Response generation error: {e}")
-            return "I encountered an error while generating a response."
+            logging.error("Batched response generation error: %s", e)
+            return ["I encountered an error while generating a response."] * len(prompts)
+
+class ResponseBatcher:
+    """
+    Asynchronous front-end to NLPEngine that coalesces concurrent prompts
+    from multiple sessions into batched generate() calls.
+    """
+    def __init__(self, nlp: NLPEngine, config: SystemConfig):
+        self.nlp = nlp
+        self.config = config
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._worker: Optional[asyncio.Task] = None
+
+    async def submit(self, prompt: str) -> str:
+        """Queue a prompt and wait for its response"""
+        if self._worker is None:
+            self._worker = asyncio.create_task(self._drain())
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((prompt, future))
+        return await future
+
+    async def close(self) -> None:
+        """Stop the background batching task"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    async def _drain(self) -> None:
+        """Collect up to batch_size prompts within batch_wait_ms and generate them together"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.config.batch_wait_ms / 1000
+            while len(batch) < self.config.batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            prompts = [prompt for prompt, _ in batch]
+            # generate() blocks, so run it off the event loop
+            try:
+                responses = await loop.run_in_executor(None, self.nlp.generate_batch, prompts)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), response in zip(batch, responses):
+                if not future.done():
+                    future.set_result(response)
 
 class JARVIS:
     """
@@ -251,23 +981,53 @@ class JARVIS:
     def __init__(self):
         self.config = SystemConfig()
         self.memory = Memory()
+        # Open the audio device once for the whole process; components share it
+        pygame.mixer.init(frequency=44100, buffer=512)
+        pygame.mixer.set_reserved(TTS_CHANNEL + 1)
         self.audio = AudioSystem(self.config)
         try:
             self.nlp = NLPEngine(self.config)
         except RuntimeError as e:
-            logging.critical(f"Failed to initialize NLP engine: {e}")
+            logging.critical("Failed to initialize NLP engine: %s", e)
             raise
         self.practical = PracticalFeatures(self.config)
 
     def process_command(self, command: str) -> None:
-        """Intelligent command routing and processing"""
-        response = self.nlp.generate_response(command)
-        self.audio.speak(response)
+        """
+        Intelligent command routing and processing.
+        Each sentence is spoken as soon as it is generated instead of after the full reply.
+        """
+        sentences: queue.Queue = queue.Queue()
+        speaker = threading.Thread(target=self.audio.speak_queue, args=(sentences,), daemon=True)
+        speaker.start()
+        try:
+            for sentence in self._iter_sentences(self.nlp.stream_response(command)):
+                sentences.put(sentence)
+        finally:
+            sentences.put(None)
+            speaker.join()
+
+    @staticmethod
+    def _iter_sentences(chunks: Iterable[str]) -> Iterator[str]:
+        """Regroup streamed text fragments into complete sentences"""
+        pending = ""
+        for chunk in chunks:
+            pending += chunk
+            *complete, pending = SENTENCE_BOUNDARY.split(pending)
+            for sentence in complete:
+                if sentence.strip():
+                    yield sentence.strip()
+        if pending.strip():
+            yield pending.strip()
 
     def run(self):
         """Main system execution loop"""
         self.audio.speak("JARVIS system online. How may I help you?")
-        
+        with self.audio:
+            self._listen_loop()
+
+    def _listen_loop(self):
+        """Wake-word listening loop, run with the microphone held open"""
         while True:
             try:
                 success, command = self.audio.listen()
@@ -281,9 +1041,10 @@ class JARVIS:
                             
             except KeyboardInterrupt:
                 self.audio.speak("System shutting down. Goodbye!")
+                self.memory.close()
                 break
             except Exception as e:
-                logging.error(f"Runtime error: {e}")
+                logging.error("Runtime error: %s", e)
                 self.audio.speak("I encountered an unexpected error.")
 
 def main():
@@ -292,7 +1053,7 @@ def main():
         jarvis = JARVIS()
         jarvis.run()
     except Exception as e:
-        logging.critical(f"Critical system error: {e}")
+        logging.critical("Critical system error: %s", e)
         print(f"JARVIS initialization failed: {e}")
 
 if __name__ == "__main__":